@@ -65,7 +65,7 @@ def _md5sum(file: IO[bytes]) -> str:
     """
     m = hashlib.md5()  # nosec
     while True:
-        d = file.read(8096)
+        d = file.read(131072)
         if not d:
             break
         m.update(d)
@@ -578,7 +578,7 @@ class FilesPipeline(MediaPipeline):
         info: MediaPipeline.SpiderInfo,
         *,
         item: Any = None,
-    ) -> FileInfo:
+    ) -> FileInfo | Deferred[FileInfo]:
         referer = referer_str(request)
 
         if response.status != 200:
@@ -611,31 +611,46 @@ class FilesPipeline(MediaPipeline):
         try:
             path = self.file_path(request, response=response, info=info, item=item)
             checksum = self.file_downloaded(response, request, info, item=item)
-        except FileException as exc:
+        except Exception as exc:
+            self._file_processing_failed(exc, request, info)
+
+        def _file_info(checksum: str) -> FileInfo:
+            return {
+                "url": request.url,
+                "path": path,
+                "checksum": checksum,
+                "status": status,
+            }
+
+        if isinstance(checksum, Deferred):
+            dfd: Deferred[FileInfo] = checksum.addCallback(_file_info)
+            dfd.addErrback(
+                lambda f: self._file_processing_failed(f.value, request, info)
+            )
+            return dfd
+        return _file_info(checksum)
+
+    def _file_processing_failed(
+        self, exc: BaseException, request: Request, info: MediaPipeline.SpiderInfo
+    ) -> NoReturn:
+        referer = referer_str(request)
+        if isinstance(exc, FileException):
             logger.warning(
                 "File (error): Error processing file from %(request)s "
                 "referred in <%(referer)s>: %(errormsg)s",
                 {"request": request, "referer": referer, "errormsg": str(exc)},
                 extra={"spider": info.spider},
-                exc_info=True,
+                exc_info=exc,
             )
-            raise
-        except Exception as exc:
-            logger.error(
-                "File (unknown-error): Error processing file from %(request)s "
-                "referred in <%(referer)s>",
-                {"request": request, "referer": referer},
-                exc_info=True,
-                extra={"spider": info.spider},
-            )
-            raise FileException(str(exc))
-
-        return {
-            "url": request.url,
-            "path": path,
-            "checksum": checksum,
-            "status": status,
-        }
+            raise exc
+        logger.error(
+            "File (unknown-error): Error processing file from %(request)s "
+            "referred in <%(referer)s>",
+            {"request": request, "referer": referer},
+            exc_info=exc,
+            extra={"spider": info.spider},
+        )
+        raise FileException(str(exc))
 
     def inc_stats(self, spider: Spider, status: str) -> None:
         assert spider.crawler.stats
@@ -656,7 +671,7 @@ class FilesPipeline(MediaPipeline):
         info: MediaPipeline.SpiderInfo,
         *,
         item: Any = None,
-    ) -> str:
+    ) -> str | Deferred[str]:
         path = self.file_path(request, response=response, info=info, item=item)
         buf = BytesIO(response.body)
         checksum = _md5sum(buf)
@@ -8,12 +8,19 @@ from __future__ import annotations
 
 import functools
 import hashlib
+import logging
+import math
+import os
+import platform
+import struct
 import warnings
 from contextlib import suppress
 from io import BytesIO
 from typing import TYPE_CHECKING, Any, cast
 
 from itemadapter import ItemAdapter
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
 
 from scrapy.exceptions import DropItem, NotConfigured, ScrapyDeprecationWarning
 from scrapy.http import Request, Response
@@ -34,6 +41,7 @@ if TYPE_CHECKING:
     from os import PathLike
 
     from PIL import Image
+    from twisted.internet.defer import Deferred
 
     # typing.Self requires Python 3.11
     from typing_extensions import Self
@@ -42,6 +50,158 @@ if TYPE_CHECKING:
     from scrapy.pipelines.media import FileInfoOrError, MediaPipeline
 
 
+logger = logging.getLogger(__name__)
+
+# Headers of every stored image, shared between files: stores must not
+# modify them.
+_JPEG_HEADERS: dict[str, str] = {"Content-Type": "image/jpeg"}
+
+
+# Methods called while processing an image in the thread pool, see
+# ImagesPipeline.file_downloaded().
+_THREAD_POOL_METHODS = (
+    "image_downloaded",
+    "get_images",
+    "convert_image",
+)
+
+
+def _is_pillow_simd(pillow_version: str) -> bool:
+    # Pillow-SIMD releases are post-releases of the matching Pillow version,
+    # e.g. 9.0.0.post1.
+    return ".post" in pillow_version
+
+
+def _has_libjpeg_turbo() -> bool:
+    from PIL import features
+
+    try:
+        return bool(features.check_feature("libjpeg_turbo"))
+    except ValueError:
+        # The libjpeg_turbo feature was added in Pillow 8.0.0, assume that
+        # older versions use it, as their wheels do.
+        return True
+
+
+def _get_path_hasher(name: str) -> Callable[[bytes], Any]:
+    """Return the hash function, named by the ``IMAGES_PATH_HASH`` setting,
+    used to build image file names from URLs."""
+    if name == "sha1":
+        return hashlib.sha1
+    if name == "blake2b":
+        return functools.partial(hashlib.blake2b, digest_size=20)
+    if name == "xxhash":
+        try:
+            import xxhash
+        except ImportError:
+            raise NotConfigured(
+                "IMAGES_PATH_HASH is set to 'xxhash', which requires installing "
+                "xxhash 2.0.0 or later"
+            )
+        return xxhash.xxh128
+    raise ValueError(
+        f"Unsupported IMAGES_PATH_HASH value {name!r}, use 'sha1', 'blake2b' "
+        "or 'xxhash'"
+    )
+
+
+# Start Of Frame markers, which hold the image size, among the markers
+# between 0xC0 and 0xCF: 0xC4, 0xC8 and 0xCC are other segments.
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _peek_dimensions(body: bytes) -> tuple[int, int] | None:
+    """Return the width and height of a JPEG, PNG, GIF or WebP image, read
+    from its headers without creating a Pillow image, or ``None`` if they
+    cannot be read that way."""
+    try:
+        if body.startswith(b"\xff\xd8"):
+            return _peek_jpeg_dimensions(body)
+        if body.startswith(b"\x89PNG\r\n\x1a\n") and body[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", body[16:24])
+            return width, height
+        if body.startswith((b"GIF87a", b"GIF89a")):
+            width, height = struct.unpack("<HH", body[6:10])
+            return width, height
+        if body.startswith(b"RIFF") and body[8:12] == b"WEBP":
+            return _peek_webp_dimensions(body)
+    except struct.error:
+        pass
+    return None
+
+
+def _peek_jpeg_dimensions(body: bytes) -> tuple[int, int] | None:
+    # Walk the segments that precede the first frame, they start with a
+    # 0xFF byte and a marker, followed by their big-endian length.
+    offset = 2
+    while offset + 4 <= len(body):
+        if body[offset] != 0xFF:
+            return None
+        marker = body[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+        elif marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", body[offset + 5 : offset + 9])
+            return width, height
+        elif 0xD0 <= marker <= 0xD7 or marker == 0x01:  # no length
+            offset += 2
+        else:
+            (length,) = struct.unpack(">H", body[offset + 2 : offset + 4])
+            offset += 2 + length
+    return None
+
+
+def _peek_webp_dimensions(body: bytes) -> tuple[int, int] | None:
+    if len(body) < 30:
+        return None
+    chunk = body[12:16]
+    if chunk == b"VP8 " and body[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", body[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and body[20] == 0x2F:
+        (bits,) = struct.unpack("<I", body[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return (
+            int.from_bytes(body[24:27], "little") + 1,
+            int.from_bytes(body[27:30], "little") + 1,
+        )
+    return None
+
+
+def _thumbnail_size(
+    image_size: tuple[int, int], size: tuple[int, int]
+) -> tuple[int, int] | None:
+    """Return the size of the thumbnail that fits in *size* and keeps the
+    aspect ratio of an image of *image_size*, computed like
+    :meth:`PIL.Image.Image.thumbnail` does, or ``None`` if the image already
+    fits."""
+    width, height = image_size
+    x, y = map(math.floor, size)
+    if x >= width and y >= height:
+        return None
+
+    def round_aspect(number: float, key: Callable[[int], float]) -> int:
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = width / height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+
+def _thumbs_source_size(sizes: Iterable[tuple[int, int]]) -> tuple[int, int]:
+    """Return the size the source of thumbnails of the given *sizes* can be
+    shrunk to: twice the largest thumbnail size, like the reducing gap that
+    :meth:`PIL.Image.Image.thumbnail` uses, so that resampling quality is
+    preserved."""
+    # Sizes are floored, as Image.thumbnail() does.
+    widths, heights = zip(*((math.floor(x), math.floor(y)) for x, y in sizes))
+    return 2 * max(widths), 2 * max(heights)
+
+
 class NoimagesDrop(DropItem):
     """Product with no images exception"""
 
@@ -80,6 +240,7 @@ class ImagesPipeline(FilesPipeline):
     ):
         try:
             from PIL import Image
+            from PIL import __version__ as pillow_version
 
             self._Image = Image
         except ImportError:
@@ -87,6 +248,14 @@ class ImagesPipeline(FilesPipeline):
                 "ImagesPipeline requires installing Pillow 4.0.0 or later"
             )
 
+        try:
+            # Image.Resampling.LANCZOS was added in Pillow 9.1.0
+            # remove this try except block,
+            # when updating the minimum requirements for Pillow.
+            self._resampling_filter = Image.Resampling.LANCZOS
+        except AttributeError:
+            self._resampling_filter = Image.ANTIALIAS  # type: ignore[attr-defined]
+
         super().__init__(store_uri, settings=settings, download_func=download_func)
 
         if isinstance(settings, dict) or settings is None:
@@ -120,8 +289,37 @@ class ImagesPipeline(FilesPipeline):
             resolve("IMAGES_THUMBS"), self.THUMBS
         )
 
+        self._path_hash: str = settings.get(resolve("IMAGES_PATH_HASH"), "sha1")
+        self._path_hasher: Callable[[bytes], Any] = _get_path_hasher(self._path_hash)
+
+        self._thread_pool_size: int = settings.getint(
+            resolve("IMAGES_THREAD_POOL_SIZE"), os.cpu_count() or 1
+        )
+        self._thread_pool: ThreadPool | None = None
+        self._thread_pool_shutdown_trigger: Any = None
+
+        self._jpeg_quality: int = settings.getint(resolve("IMAGES_JPEG_QUALITY"), 75)
+
         self._deprecated_convert_image: bool | None = None
 
+        if not _is_pillow_simd(pillow_version):
+            if settings.getbool(resolve("IMAGES_REQUIRE_SIMD")):
+                raise NotConfigured(
+                    "IMAGES_REQUIRE_SIMD is enabled but Pillow-SIMD is not installed"
+                )
+            if platform.machine().lower() in ("x86_64", "amd64"):
+                logger.info(
+                    "Install Pillow-SIMD instead of Pillow to speed up image "
+                    "conversion and thumbnail generation with SSE4/AVX2 "
+                    "instructions: https://github.com/uploadcare/pillow-simd"
+                )
+
+        if not _has_libjpeg_turbo():
+            logger.warning(
+                "Pillow is not built against libjpeg-turbo, JPEG encoding and "
+                "decoding of images will be slower"
+            )
+
     @classmethod
     def from_settings(cls, settings: Settings) -> Self:
         s3store: type[S3FilesStore] = cast(type[S3FilesStore], cls.STORE_SCHEMES["s3"])
@@ -150,6 +348,30 @@ class ImagesPipeline(FilesPipeline):
         store_uri = settings["IMAGES_STORE"]
         return cls(store_uri, settings=settings)
 
+    def open_spider(self, spider: Spider) -> None:
+        super().open_spider(spider)
+        if self._thread_pool_size > 0:
+            from twisted.internet import reactor
+
+            self._thread_pool = ThreadPool(
+                minthreads=0, maxthreads=self._thread_pool_size, name="ImagesPipeline"
+            )
+            self._thread_pool.start()
+            # The pool threads are not daemon threads: if the reactor stops
+            # without the spider being closed, the pool must still be stopped
+            # for the process to exit.
+            self._thread_pool_shutdown_trigger = reactor.addSystemEventTrigger(
+                "during", "shutdown", self._thread_pool.stop
+            )
+
+    def close_spider(self, spider: Spider) -> None:
+        if self._thread_pool is not None:
+            from twisted.internet import reactor
+
+            reactor.removeSystemEventTrigger(self._thread_pool_shutdown_trigger)
+            self._thread_pool.stop()
+            self._thread_pool = None
+
     def file_downloaded(
         self,
         response: Response,
@@ -157,8 +379,29 @@ class ImagesPipeline(FilesPipeline):
         info: MediaPipeline.SpiderInfo,
         *,
         item: Any = None,
-    ) -> str:
-        return self.image_downloaded(response, request, info, item=item)
+    ) -> str | Deferred[str]:
+        # Overridden methods that would run in the thread pool may not be
+        # thread-safe, so images are then processed in the reactor thread.
+        if self._thread_pool is None or any(
+            self._is_overridden(method_name) for method_name in _THREAD_POOL_METHODS
+        ):
+            return self.image_downloaded(response, request, info, item=item)
+
+        from twisted.internet import reactor
+
+        # Pillow releases the GIL while decoding, resizing and encoding, so
+        # images are processed in parallel outside of the reactor thread.
+        # File paths are computed and files are persisted from the reactor
+        # thread, so that file_path() and thumb_path() overrides, and the
+        # stores, do not need to be thread-safe.
+        path = self.file_path(request, response=response, info=info, item=item)
+        thumbs = self._thumb_paths(request, response=response, info=info, item=item)
+        dfd: Deferred[list[tuple[str, Image.Image, BytesIO]]] = deferToThreadPool(
+            reactor,  # type: ignore[arg-type]
+            self._thread_pool,
+            lambda: list(self._process_images(response.body, path, thumbs)),
+        )
+        return dfd.addCallback(self._persist_images, info)
 
     def image_downloaded(
         self,
@@ -167,21 +410,34 @@ class ImagesPipeline(FilesPipeline):
         info: MediaPipeline.SpiderInfo,
         *,
         item: Any = None,
+    ) -> str:
+        images = self.get_images(response, request, info, item=item)
+        return self._persist_images(images, info)
+
+    def _persist_images(
+        self,
+        images: Iterable[tuple[str, Image.Image, BytesIO]],
+        info: MediaPipeline.SpiderInfo,
     ) -> str:
         checksum: str | None = None
-        for path, image, buf in self.get_images(response, request, info, item=item):
+        files: list[tuple[str, BytesIO, dict[str, Any]]] = []
+        for path, image, buf in images:
             if checksum is None:
-                buf.seek(0)
-                checksum = _md5sum(buf)
+                if isinstance(buf, BytesIO):
+                    # getvalue() returns the underlying bytes without copying
+                    # them, unlike getbuffer() which unshares the buffer.
+                    checksum = hashlib.md5(buf.getvalue()).hexdigest()  # nosec
+                else:
+                    buf.seek(0)
+                    checksum = _md5sum(buf)
             width, height = image.size
-            self.store.persist_file(
-                path,
-                buf,
-                info,
-                meta={"width": width, "height": height},
-                headers={"Content-Type": "image/jpeg"},
-            )
+            files.append((path, buf, {"width": width, "height": height}))
         assert checksum is not None
+        # Files are only stored once the full image and all its thumbnails
+        # have been generated, so that an error does not leave some of them
+        # stored without the others.
+        for path, buf, meta in files:
+            self.store.persist_file(path, buf, info, meta=meta, headers=_JPEG_HEADERS)
         return checksum
 
     def get_images(
@@ -193,15 +449,53 @@ class ImagesPipeline(FilesPipeline):
         item: Any = None,
     ) -> Iterable[tuple[str, Image.Image, BytesIO]]:
         path = self.file_path(request, response=response, info=info, item=item)
-        orig_image = self._Image.open(BytesIO(response.body))
+        thumbs = self._thumb_paths(request, response=response, info=info, item=item)
+        yield from self._process_images(response.body, path, thumbs)
 
-        width, height = orig_image.size
-        if width < self.min_width or height < self.min_height:
-            raise ImageException(
-                "Image too small "
-                f"({width}x{height} < "
-                f"{self.min_width}x{self.min_height})"
+    def _thumb_paths(
+        self,
+        request: Request,
+        response: Response,
+        info: MediaPipeline.SpiderInfo,
+        *,
+        item: Any = None,
+    ) -> list[tuple[str, tuple[int, int]]]:
+        """Return the path and size of each thumbnail of an image."""
+        thumb_path = self.thumb_path
+        return [
+            (
+                thumb_path(request, thumb_id, response=response, info=info, item=item),
+                size,
             )
+            for thumb_id, size in self.thumbs.items()
+        ]
+
+    def _process_images(
+        self,
+        body: bytes,
+        path: str,
+        thumbs: list[tuple[str, tuple[int, int]]],
+    ) -> Iterable[tuple[str, Image.Image, BytesIO]]:
+        """Convert the downloaded image and generate its thumbnails, yielding
+        them with the given paths.
+
+        It only uses Pillow and pipeline settings, so it can run outside of
+        the reactor thread.
+        """
+        if self.min_width or self.min_height:
+            # Reject small images from their headers, before Pillow opens them
+            size = _peek_dimensions(body)
+            if size is not None:
+                self._check_min_size(*size)
+
+        # The same buffer is read by Pillow and, when the downloaded image is
+        # stored as is, by the store. On CPython, it shares the memory of
+        # the body until something is written to it, which never happens, so
+        # the body is not copied.
+        body_buf = BytesIO(body)
+        orig_image = self._Image.open(body_buf)
+
+        self._check_min_size(*orig_image.size)
 
         if self._deprecated_convert_image is None:
             self._deprecated_convert_image = "response_body" not in get_func_args(
@@ -214,23 +508,103 @@ class ImagesPipeline(FilesPipeline):
                     category=ScrapyDeprecationWarning,
                 )
 
-        if self._deprecated_convert_image:
-            image, buf = self.convert_image(orig_image)
+        # Everything that does not depend on the image is resolved once here
+        # rather than for each thumbnail. It is not done once in __init__,
+        # because subclasses and tests may replace these methods afterwards.
+        convert_image = self.convert_image
+        convert_overridden = self._is_overridden("convert_image")
+        deprecated_convert_image = self._deprecated_convert_image
+
+        image: Image.Image
+        buf: BytesIO
+        if (
+            orig_image.format == "JPEG"
+            and orig_image.mode == "RGB"
+            and not convert_overridden
+        ):
+            # Nothing to convert, store the downloaded JPEG as is. The image
+            # is not decoded, its size comes from the JPEG header.
+            image, buf = orig_image, body_buf
+        elif deprecated_convert_image:
+            image, buf = convert_image(orig_image)
         else:
-            image, buf = self.convert_image(
-                orig_image, response_body=BytesIO(response.body)
-            )
+            image, buf = convert_image(orig_image, response_body=body_buf)
         yield path, image, buf
 
-        for thumb_id, size in self.thumbs.items():
-            thumb_path = self.thumb_path(
-                request, thumb_id, response=response, info=info, item=item
-            )
-            if self._deprecated_convert_image:
-                thumb_image, thumb_buf = self.convert_image(image, size)
+        if not thumbs:
+            return
+
+        convert_thumb: Callable[[tuple[int, int]], tuple[Image.Image, BytesIO]]
+        if not convert_overridden:
+            # The thumbnails are resized from a single, already converted
+            # source, and their size is computed from the original image
+            # size, so that it does not depend on how much the source was
+            # shrunk beforehand.
+            source_size = _thumbs_source_size(size for _, size in thumbs)
+            if orig_image.format == "JPEG":
+                thumb_source = self._normalize_mode(
+                    self._open_jpeg_draft(body, source_size)
+                )
             else:
-                thumb_image, thumb_buf = self.convert_image(image, size, buf)
-            yield thumb_path, thumb_image, thumb_buf
+                thumb_source = self._reduce_for_thumbs(image, source_size)
+            full_size = orig_image.size
+            resize = functools.partial(self._resize, thumb_source, full_size)
+            encode_jpeg = self._encode_jpeg
+
+            def resize_thumb(size: tuple[int, int]) -> tuple[Image.Image, BytesIO]:
+                if _thumbnail_size(full_size, size) is None:
+                    # The image already fits, the stored full image is reused
+                    # instead of being encoded again. It gets its own buffer
+                    # (sharing the same bytes), as stores may close buffers.
+                    return image, BytesIO(buf.getvalue())
+                thumb_image = resize(size)
+                return thumb_image, encode_jpeg(thumb_image)
+
+            convert_thumb = resize_thumb
+        elif deprecated_convert_image:
+            convert_thumb = functools.partial(convert_image, image)
+        else:
+            convert_thumb = functools.partial(convert_image, image, response_body=buf)
+
+        for thumb_path, size in thumbs:
+            yield (thumb_path, *convert_thumb(size))
+
+    def _check_min_size(self, width: int, height: int) -> None:
+        if width < self.min_width or height < self.min_height:
+            raise ImageException(
+                "Image too small "
+                f"({width}x{height} < "
+                f"{self.min_width}x{self.min_height})"
+            )
+
+    def _is_overridden(self, method_name: str) -> bool:
+        return getattr(getattr(self, method_name), "__func__", None) is not getattr(
+            ImagesPipeline, method_name
+        )
+
+    def _open_jpeg_draft(
+        self, body: bytes, source_size: tuple[int, int]
+    ) -> Image.Image:
+        """Open a JPEG image that libjpeg will decode at the smallest scale
+        (1/2, 1/4 or 1/8) that is still at least *source_size*."""
+        image = self._Image.open(BytesIO(body))
+        image.draft("RGB", source_size)
+        return image
+
+    def _reduce_for_thumbs(
+        self, image: Image.Image, source_size: tuple[int, int]
+    ) -> Image.Image:
+        """Shrink an image with a fast box filter, by the largest integer
+        factor that keeps it at least *source_size*.
+
+        This is done once for all thumbnails, like :meth:`_open_jpeg_draft`
+        does for JPEG images, so that LANCZOS resamples smaller images.
+        """
+        min_width, min_height = source_size
+        factor = min(image.size[0] // min_width, image.size[1] // min_height)
+        if factor < 2:
+            return image
+        return image.reduce(factor)
 
     def convert_image(
         self,
@@ -246,34 +620,75 @@ class ImagesPipeline(FilesPipeline):
                 stacklevel=2,
             )
 
-        if image.format in ("PNG", "WEBP") and image.mode == "RGBA":
-            background = self._Image.new("RGBA", image.size, (255, 255, 255))
-            background.paste(image, image)
-            image = background.convert("RGB")
-        elif image.mode == "P":
-            image = image.convert("RGBA")
-            background = self._Image.new("RGBA", image.size, (255, 255, 255))
-            background.paste(image, image)
-            image = background.convert("RGB")
-        elif image.mode != "RGB":
-            image = image.convert("RGB")
+        image = self._normalize_mode(image)
 
         if size:
-            image = image.copy()
-            try:
-                # Image.Resampling.LANCZOS was added in Pillow 9.1.0
-                # remove this try except block,
-                # when updating the minimum requirements for Pillow.
-                resampling_filter = self._Image.Resampling.LANCZOS
-            except AttributeError:
-                resampling_filter = self._Image.ANTIALIAS  # type: ignore[attr-defined]
-            image.thumbnail(size, resampling_filter)
+            thumbnail = self._resize(image, image.size, size)
+            if (
+                thumbnail is image
+                and response_body is not None
+                and image.format == "JPEG"
+            ):
+                # The image already fits, no need to encode it again
+                return image, BytesIO(response_body.getvalue())
+            image = thumbnail
         elif response_body is not None and image.format == "JPEG":
             return image, response_body
 
+        return image, self._encode_jpeg(image)
+
+    def _normalize_mode(self, image: Image.Image) -> Image.Image:
+        """Return *image* in RGB mode, which is what JPEG files can store."""
+        # Transparent images are pasted on a white RGB background, using
+        # their alpha channel as mask, which spares an RGBA background and
+        # its conversion to RGB.
+        if image.format in ("PNG", "WEBP") and image.mode == "RGBA":
+            background = self._Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image)
+            return background
+        if image.mode == "P":
+            image = image.convert("RGBA")
+            background = self._Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image)
+            return background
+        if image.mode != "RGB":
+            return image.convert("RGB")
+        return image
+
+    def _resize(
+        self,
+        image: Image.Image,
+        original_size: tuple[int, int],
+        size: tuple[int, int],
+    ) -> Image.Image:
+        """Resize *image* to the size that ``Image.thumbnail(size)`` would
+        give to an image of *original_size*.
+
+        *image* may be a shrunk version of the original image, see
+        :meth:`_open_jpeg_draft` and :meth:`_reduce_for_thumbs`.
+        """
+        thumbnail_size = _thumbnail_size(original_size, size)
+        if thumbnail_size is None:
+            return image
+        # Same result as image.thumbnail(), but resize() returns a new image,
+        # so the given image does not need to be copied first. The reducing
+        # gap lets Pillow shrink the image with reduce() before resampling.
+        return image.resize(thumbnail_size, self._resampling_filter, reducing_gap=2.0)
+
+    def _encode_jpeg(self, image: Image.Image) -> BytesIO:
+        # Optimized Huffman tables and progressive encoding make encoding
+        # noticeably slower for a small gain in size, so they are disabled
+        # explicitly, along with 4:2:0 chroma subsampling.
         buf = BytesIO()
-        image.save(buf, "JPEG")
-        return image, buf
+        image.save(
+            buf,
+            "JPEG",
+            quality=self._jpeg_quality,
+            optimize=False,
+            progressive=False,
+            subsampling=2,
+        )
+        return buf
 
     def get_media_requests(
         self, item: Any, info: MediaPipeline.SpiderInfo
@@ -296,7 +711,7 @@ class ImagesPipeline(FilesPipeline):
         *,
         item: Any = None,
     ) -> str:
-        image_guid = hashlib.sha1(to_bytes(request.url)).hexdigest()  # nosec
+        image_guid = self._url_guid(request)
         return f"full/{image_guid}.jpg"
 
     def thumb_path(
@@ -308,5 +723,19 @@ class ImagesPipeline(FilesPipeline):
         *,
         item: Any = None,
     ) -> str:
-        thumb_guid = hashlib.sha1(to_bytes(request.url)).hexdigest()  # nosec
+        thumb_guid = self._url_guid(request)
         return f"thumbs/{thumb_id}/{thumb_guid}.jpg"
+
+    def _url_guid(self, request: Request) -> str:
+        """Return the URL hash used in the file names of the full image and
+        of its thumbnails, computing it only once per request."""
+        # The URL is kept next to its hash, because request.replace() copies
+        # the meta of the original request. There is a key per hash function,
+        # because pipelines with different IMAGES_PATH_HASH values may
+        # process the same request.
+        meta_key = f"_image_guid_{self._path_hash}"
+        url, guid = request.meta.get(meta_key, (None, None))
+        if url != request.url:
+            guid = self._path_hasher(to_bytes(request.url)).hexdigest()  # nosec
+            request.meta[meta_key] = (request.url, guid)
+        return guid
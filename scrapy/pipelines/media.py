@@ -259,7 +259,7 @@ class MediaPipeline(ABC):
         info: SpiderInfo,
         *,
         item: Any = None,
-    ) -> FileInfo:
+    ) -> FileInfo | Deferred[FileInfo]:
         """Handler for success downloads"""
         raise NotImplementedError()
 
@@ -3,26 +3,39 @@ from __future__ import annotations
 import dataclasses
 import hashlib
 import io
+import logging
 import random
+import subprocess
+import sys
+import threading
 import warnings
+from pathlib import Path
 from shutil import rmtree
 from tempfile import mkdtemp
 from unittest.mock import patch
 
 import attr
 from itemadapter import ItemAdapter
+from testfixtures import LogCapture
+from twisted.internet import defer
 from twisted.trial import unittest
 
-from scrapy.exceptions import ScrapyDeprecationWarning
+from scrapy.exceptions import NotConfigured, ScrapyDeprecationWarning
 from scrapy.http import Request, Response
 from scrapy.item import Field, Item
-from scrapy.pipelines.images import ImageException, ImagesPipeline, NoimagesDrop
+from scrapy.pipelines.images import (
+    ImageException,
+    ImagesPipeline,
+    NoimagesDrop,
+    _peek_dimensions,
+)
 from scrapy.settings import Settings
 from scrapy.utils.python import to_bytes
 
 skip_pillow: str | None
 try:
     from PIL import Image
+    from PIL.JpegImagePlugin import JpegImageFile
 except ImportError:
     skip_pillow = (
         "Missing Python Imaging Library, install https://pypi.python.org/pypi/Pillow"
@@ -119,6 +132,77 @@ class ImagesPipelineTestCase(unittest.TestCase):
             "thumbs/50/850233df65a5b83361798f532f1fc549cd13cbe9.jpg",
         )
 
+    def test_url_hash_computed_once(self):
+        self.pipeline.thumbs = {"small": (20, 20), "big": (50, 50)}
+        request = Request("https://dev.mydeco.com/mydeco.gif")
+        with patch.object(self.pipeline, "_path_hasher", wraps=hashlib.sha1) as sha1:
+            paths = [self.pipeline.file_path(request)] + [
+                self.pipeline.thumb_path(request, thumb_id)
+                for thumb_id in self.pipeline.thumbs
+            ]
+            self.assertEqual(sha1.call_count, 1)
+            self.assertEqual(
+                paths,
+                [
+                    "full/3fd165099d8e71b8a48b2683946e64dbfad8b52d.jpg",
+                    "thumbs/small/3fd165099d8e71b8a48b2683946e64dbfad8b52d.jpg",
+                    "thumbs/big/3fd165099d8e71b8a48b2683946e64dbfad8b52d.jpg",
+                ],
+            )
+
+            replaced = request.replace(url="file://foo.png")
+            self.assertEqual(
+                self.pipeline.thumb_path(replaced, "50"),
+                "thumbs/50/e55b765eba0ec7348e50a1df496040449071b96a.jpg",
+            )
+            self.assertEqual(sha1.call_count, 2)
+
+    def test_path_hash(self):
+        request = Request("https://dev.mydeco.com/mydeco.gif")
+        url = b"https://dev.mydeco.com/mydeco.gif"
+        blake2b = hashlib.blake2b(url, digest_size=20).hexdigest()
+        pipeline = ImagesPipeline(
+            self.tempdir, settings={"IMAGES_PATH_HASH": "blake2b"}
+        )
+        self.assertEqual(pipeline.file_path(request), f"full/{blake2b}.jpg")
+        self.assertEqual(
+            pipeline.thumb_path(request, "small"), f"thumbs/small/{blake2b}.jpg"
+        )
+
+        with self.assertRaises(ValueError):
+            ImagesPipeline(self.tempdir, settings={"IMAGES_PATH_HASH": "md5"})
+
+    def test_path_hash_shared_request(self):
+        request = Request("https://dev.mydeco.com/mydeco.gif")
+        url = b"https://dev.mydeco.com/mydeco.gif"
+        sha1 = hashlib.sha1(url).hexdigest()
+        blake2b = hashlib.blake2b(url, digest_size=20).hexdigest()
+        pipeline = ImagesPipeline(
+            self.tempdir, settings={"IMAGES_PATH_HASH": "blake2b"}
+        )
+        # Each pipeline uses its own hash, whichever processes the request first
+        self.assertEqual(self.pipeline.file_path(request), f"full/{sha1}.jpg")
+        self.assertEqual(pipeline.file_path(request), f"full/{blake2b}.jpg")
+        self.assertEqual(
+            pipeline.thumb_path(request, "small"), f"thumbs/small/{blake2b}.jpg"
+        )
+        self.assertEqual(
+            self.pipeline.thumb_path(request, "small"), f"thumbs/small/{sha1}.jpg"
+        )
+
+    def test_path_hash_xxhash(self):
+        try:
+            import xxhash
+        except ImportError:
+            with self.assertRaises(NotConfigured):
+                ImagesPipeline(self.tempdir, settings={"IMAGES_PATH_HASH": "xxhash"})
+            return
+        request = Request("https://dev.mydeco.com/mydeco.gif")
+        digest = xxhash.xxh128(b"https://dev.mydeco.com/mydeco.gif").hexdigest()
+        pipeline = ImagesPipeline(self.tempdir, settings={"IMAGES_PATH_HASH": "xxhash"})
+        self.assertEqual(pipeline.file_path(request), f"full/{digest}.jpg")
+        self.assertEqual(len(digest), 32)
+
     def test_thumbnail_name_from_item(self):
         """
         Custom thumbnail name based on item data, overriding default implementation
@@ -159,6 +243,65 @@ class ImagesPipelineTestCase(unittest.TestCase):
         with self.assertRaises(ImageException):
             next(self.pipeline.get_images(response=resp3, request=req, info=object()))
 
+    def test_get_images_exception_before_open(self):
+        self.pipeline.min_width = 100
+        self.pipeline.min_height = 100
+
+        for format in ("JPEG", "PNG", "GIF", "WEBP"):
+            _, buf = _create_image(format, "RGB", (150, 50), (0, 0, 0))
+            resp = Response(
+                url="https://dev.mydeco.com/mydeco.gif", body=buf.getvalue()
+            )
+            req = Request(url="https://dev.mydeco.com/mydeco.gif")
+            with patch.object(Image, "open", autospec=True) as open_:
+                with self.assertRaisesRegex(
+                    ImageException, r"Image too small \(150x50 < 100x100\)"
+                ):
+                    next(
+                        self.pipeline.get_images(
+                            response=resp, request=req, info=object()
+                        )
+                    )
+            open_.assert_not_called()
+
+        # Images whose size cannot be read from their headers are checked
+        # after being opened
+        _, buf = _create_image("BMP", "RGB", (150, 50), (0, 0, 0))
+        resp = Response(url="https://dev.mydeco.com/mydeco.bmp", body=buf.getvalue())
+        with self.assertRaises(ImageException):
+            next(self.pipeline.get_images(response=resp, request=req, info=object()))
+
+    def test_peek_dimensions(self):
+        images = [
+            ("JPEG", "RGB", {}),
+            ("JPEG", "RGB", {"progressive": True}),
+            ("JPEG", "RGB", {"exif": b"Exif\x00\x00" + b"\x00" * 100}),
+            ("JPEG", "L", {}),
+            ("PNG", "RGBA", {}),
+            ("GIF", "P", {}),
+            ("WEBP", "RGB", {}),
+            ("WEBP", "RGB", {"lossless": True}),
+            ("WEBP", "RGBA", {}),
+        ]
+        for format, mode, params in images:
+            for size in ((1, 1), (37, 91), (640, 480)):
+                buf = io.BytesIO()
+                Image.new(mode, size).save(buf, format, **params)
+                self.assertEqual(
+                    _peek_dimensions(buf.getvalue()), size, (format, params)
+                )
+
+        _, buf = _create_image("BMP", "RGB", (50, 50), (0, 0, 0))
+        self.assertIsNone(_peek_dimensions(buf.getvalue()))
+        for body in (
+            b"",
+            b"\xff\xd8\xff\xc0\x00\x11",
+            b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR",
+            b"GIF89a",
+            b"RIFF\x00\x00\x00\x00WEBPVP8X",
+        ):
+            self.assertIsNone(_peek_dimensions(body), body)
+
     def test_get_images_new(self):
         self.pipeline.min_width = 0
         self.pipeline.min_height = 0
@@ -185,6 +328,355 @@ class ImagesPipelineTestCase(unittest.TestCase):
         self.assertEqual(thumb_img, thumb_img)
         self.assertEqual(orig_thumb_buf.getvalue(), thumb_buf.getvalue())
 
+    def test_get_images_jpeg_draft(self):
+        self.pipeline.thumbs = {"small": (20, 20), "big": (50, 50)}
+
+        _, buf = _create_image("JPEG", "RGB", (400, 400), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.jpg", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.jpg")
+
+        with patch.object(
+            JpegImageFile, "draft", autospec=True, side_effect=JpegImageFile.draft
+        ) as draft:
+            images = list(
+                self.pipeline.get_images(response=resp, request=req, info=object())
+            )
+        self.assertEqual(draft.call_count, 1)
+        self.assertEqual(draft.call_args[0][1:], ("RGB", (100, 100)))
+        self.assertEqual(
+            [image.size for _, image, _ in images], [(400, 400), (20, 20), (50, 50)]
+        )
+        self.assertEqual(images[0][2].getvalue(), buf.getvalue())
+
+    def test_get_images_jpeg_not_decoded(self):
+        _, buf = _create_image("JPEG", "RGB", (50, 50), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.jpg", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.jpg")
+
+        with patch.object(
+            JpegImageFile, "load", autospec=True, side_effect=JpegImageFile.load
+        ) as load:
+            images = list(
+                self.pipeline.get_images(response=resp, request=req, info=object())
+            )
+        load.assert_not_called()
+        self.assertEqual(len(images), 1)
+        _, image, new_buf = images[0]
+        self.assertEqual(image.size, (50, 50))
+        self.assertEqual(new_buf.getvalue(), buf.getvalue())
+        # The buffer opened by Pillow is reused, not a copy of the body
+        self.assertIs(image.fp, new_buf)
+
+    def test_get_images_png_no_draft(self):
+        self.pipeline.thumbs = {"small": (20, 20)}
+
+        _, buf = _create_image("PNG", "RGB", (400, 400), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.png", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.png")
+
+        with patch.object(
+            JpegImageFile, "draft", autospec=True, side_effect=JpegImageFile.draft
+        ) as draft:
+            images = list(
+                self.pipeline.get_images(response=resp, request=req, info=object())
+            )
+        draft.assert_not_called()
+        self.assertEqual([image.size for _, image, _ in images], [(400, 400), (20, 20)])
+
+    def test_get_images_png_reduce(self):
+        self.pipeline.thumbs = {"small": (20, 20), "big": (50, 50)}
+
+        orig_image, buf = _create_image("PNG", "RGB", (400, 300), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.png", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.png")
+
+        with patch.object(
+            Image.Image, "reduce", autospec=True, side_effect=Image.Image.reduce
+        ) as reduce:
+            images = list(
+                self.pipeline.get_images(response=resp, request=req, info=object())
+            )
+        # The source image is reduced once, before resizing the thumbnails
+        source, factor = reduce.call_args_list[0][0]
+        self.assertEqual((source.size, factor), ((400, 300), 3))
+        self.assertTrue(
+            all(call[0][0].size != (400, 300) for call in reduce.call_args_list[1:])
+        )
+        # Thumbnail sizes are the ones Image.thumbnail() gives, regardless of
+        # the reduction
+        expected = []
+        for size in self.pipeline.thumbs.values():
+            thumb = orig_image.copy()
+            thumb.thumbnail(size)
+            expected.append(thumb.size)
+        self.assertEqual(expected, [(20, 15), (50, 38)])
+        self.assertEqual(
+            [image.size for _, image, _ in images], [(400, 300), *expected]
+        )
+        self.assertEqual(images[2][1].getcolors(), [(50 * 38, (0, 127, 255))])
+
+    def test_get_images_float_thumb_size(self):
+        self.pipeline.thumbs = {"small": (50.5, 50.5)}
+        for format in ("PNG", "JPEG"):
+            orig_image, buf = _create_image(format, "RGB", (800, 600), (0, 127, 255))
+            resp = Response(
+                url="https://dev.mydeco.com/mydeco.png", body=buf.getvalue()
+            )
+            req = Request(url="https://dev.mydeco.com/mydeco.png")
+
+            images = list(
+                self.pipeline.get_images(response=resp, request=req, info=object())
+            )
+            thumb = orig_image.copy()
+            thumb.thumbnail((50.5, 50.5))
+            self.assertEqual(thumb.size, (50, 38))
+            self.assertEqual(images[1][1].size, thumb.size)
+
+    def test_get_images_thumbs_converted_once(self):
+        self.pipeline.thumbs = {"small": (20, 20), "big": (50, 50)}
+
+        _, buf = _create_image("PNG", "RGBA", (200, 200), (0, 127, 255, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.png", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.png")
+
+        with patch.object(
+            ImagesPipeline,
+            "_normalize_mode",
+            autospec=True,
+            side_effect=ImagesPipeline._normalize_mode,
+        ) as normalize_mode:
+            images = list(
+                self.pipeline.get_images(response=resp, request=req, info=object())
+            )
+        self.assertEqual(normalize_mode.call_count, 1)
+        self.assertEqual(
+            [(image.mode, image.size) for _, image, _ in images],
+            [("RGB", (200, 200)), ("RGB", (20, 20)), ("RGB", (50, 50))],
+        )
+        for _, image, thumb_buf in images[1:]:
+            self.assertEqual(Image.open(thumb_buf).size, image.size)
+
+    def test_get_images_thumbs_changed(self):
+        self.pipeline.thumbs = {"small": (20, 20), "big": (50, 40)}
+        _, buf = _create_image("PNG", "RGB", (200, 200), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.png", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.png")
+
+        def thumbs():
+            images = self.pipeline.get_images(response=resp, request=req, info=object())
+            return [(path, image.size) for path, image, _ in images][1:]
+
+        guid = self.pipeline._url_guid(req)
+        self.assertEqual(
+            thumbs(),
+            [
+                (f"thumbs/small/{guid}.jpg", (20, 20)),
+                (f"thumbs/big/{guid}.jpg", (40, 40)),
+            ],
+        )
+
+        # Assigning other thumbnails is taken into account
+        self.pipeline.thumbs = {"small": (20, 20)}
+        self.assertEqual(thumbs(), [(f"thumbs/small/{guid}.jpg", (20, 20))])
+
+        # So is changing thumbnails in place, including the size the source
+        # is reduced to
+        self.pipeline.thumbs["huge"] = (150, 150)
+        with patch.object(
+            ImagesPipeline,
+            "_reduce_for_thumbs",
+            autospec=True,
+            side_effect=ImagesPipeline._reduce_for_thumbs,
+        ) as reduce_for_thumbs:
+            self.assertEqual(
+                thumbs(),
+                [
+                    (f"thumbs/small/{guid}.jpg", (20, 20)),
+                    (f"thumbs/huge/{guid}.jpg", (150, 150)),
+                ],
+            )
+        self.assertEqual(reduce_for_thumbs.call_args.args[2], (300, 300))
+
+    def test_image_downloaded_checksum(self):
+        self.pipeline.thumbs = {"small": (20, 20)}
+        _, buf = _create_image("JPEG", "RGB", (50, 50), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.jpg", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.jpg")
+
+        checksum = self.pipeline.image_downloaded(resp, req, info=object())
+        self.assertEqual(checksum, hashlib.md5(buf.getvalue()).hexdigest())
+
+    def test_image_downloaded_persist_file(self):
+        self.pipeline.thumbs = {"small": (20, 20)}
+        _, buf = _create_image("JPEG", "RGB", (50, 50), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.jpg", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.jpg")
+
+        with patch.object(self.pipeline.store, "persist_file") as persist_file:
+            self.pipeline.image_downloaded(resp, req, info=object())
+        self.assertEqual(
+            [
+                (call.args[0], call.kwargs["meta"], call.kwargs["headers"])
+                for call in persist_file.call_args_list
+            ],
+            [
+                (
+                    self.pipeline.file_path(req),
+                    {"width": 50, "height": 50},
+                    {"Content-Type": "image/jpeg"},
+                ),
+                (
+                    self.pipeline.thumb_path(req, "small"),
+                    {"width": 20, "height": 20},
+                    {"Content-Type": "image/jpeg"},
+                ),
+            ],
+        )
+        # The headers dict is shared instead of being built for every file
+        first, second = persist_file.call_args_list
+        self.assertIs(first.kwargs["headers"], second.kwargs["headers"])
+
+    def test_image_downloaded_thumbnail_error(self):
+        self.pipeline.thumbs = {"small": (20, 20)}
+        _, buf = _create_image("JPEG", "RGB", (50, 50), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.jpg", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.jpg")
+
+        # Nothing is stored if a thumbnail cannot be generated
+        with patch.object(self.pipeline.store, "persist_file") as persist_file:
+            with patch.object(
+                ImagesPipeline, "_encode_jpeg", side_effect=OSError("encoder error")
+            ):
+                with self.assertRaises(OSError):
+                    self.pipeline.image_downloaded(resp, req, info=object())
+        persist_file.assert_not_called()
+
+    @defer.inlineCallbacks
+    def test_file_downloaded_thread_pool(self):
+        self.pipeline.thumbs = {"small": (20, 20)}
+        _, buf = _create_image("PNG", "RGB", (50, 50), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.png", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.png")
+
+        self.pipeline.open_spider(None)
+        try:
+            dfd = self.pipeline.file_downloaded(resp, req, self.pipeline.spiderinfo)
+            self.assertIsInstance(dfd, defer.Deferred)
+            checksum = yield dfd
+        finally:
+            self.pipeline.close_spider(None)
+
+        full = Path(self.tempdir, "full", f"{self.pipeline._url_guid(req)}.jpg")
+        self.assertEqual(checksum, hashlib.md5(full.read_bytes()).hexdigest())
+        self.assertTrue(Path(self.tempdir, "thumbs", "small", full.name).exists())
+
+    def test_thread_pool_stopped_with_reactor(self):
+        # The thread pool must be stopped when the reactor stops, even if the
+        # spider is not closed, or its threads keep the process running.
+        script = """
+import sys
+from io import BytesIO
+
+from PIL import Image
+from twisted.internet import reactor
+
+from scrapy.http import Request, Response
+from scrapy.pipelines.images import ImagesPipeline
+
+buf = BytesIO()
+Image.new("RGB", (50, 50)).save(buf, "PNG")
+pipeline = ImagesPipeline(sys.argv[1], settings={"IMAGES_THUMBS": {"small": (20, 20)}})
+pipeline.open_spider(None)
+
+
+def process():
+    url = "https://dev.mydeco.com/mydeco.png"
+    dfd = pipeline.file_downloaded(
+        Response(url, body=buf.getvalue()), Request(url), pipeline.spiderinfo
+    )
+    dfd.addBoth(lambda _: reactor.stop())
+
+
+reactor.callWhenRunning(process)
+reactor.run()
+"""
+        subprocess.run(
+            [sys.executable, "-c", script, self.tempdir], check=True, timeout=60
+        )
+
+    def test_file_downloaded_no_thread_pool(self):
+        pipeline = ImagesPipeline(self.tempdir, settings={"IMAGES_THREAD_POOL_SIZE": 0})
+        _, buf = _create_image("JPEG", "RGB", (50, 50), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.jpg", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.jpg")
+
+        pipeline.open_spider(None)
+        checksum = pipeline.file_downloaded(resp, req, pipeline.spiderinfo)
+        pipeline.close_spider(None)
+        self.assertEqual(checksum, hashlib.md5(buf.getvalue()).hexdigest())
+
+    @defer.inlineCallbacks
+    def test_file_downloaded_overridden_paths_thread_pool(self):
+        threads = []
+
+        class CustomPathsPipeline(ImagesPipeline):
+            def file_path(self, request, response=None, info=None, *, item=None):
+                threads.append(threading.current_thread())
+                return "full/custom.jpg"
+
+            def thumb_path(
+                self, request, thumb_id, response=None, info=None, *, item=None
+            ):
+                threads.append(threading.current_thread())
+                return f"thumbs/{thumb_id}/custom.jpg"
+
+        pipeline = CustomPathsPipeline(
+            self.tempdir, settings={"IMAGES_THUMBS": {"small": (20, 20)}}
+        )
+        _, buf = _create_image("PNG", "RGB", (50, 50), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.png", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.png")
+
+        # Images are processed in the thread pool, but paths are computed in
+        # the reactor thread
+        pipeline.open_spider(None)
+        try:
+            dfd = pipeline.file_downloaded(resp, req, pipeline.spiderinfo)
+            self.assertIsInstance(dfd, defer.Deferred)
+            checksum = yield dfd
+        finally:
+            pipeline.close_spider(None)
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(t is threading.main_thread() for t in threads))
+        full = Path(self.tempdir, "full", "custom.jpg")
+        self.assertEqual(checksum, hashlib.md5(full.read_bytes()).hexdigest())
+        self.assertTrue(Path(self.tempdir, "thumbs", "small", "custom.jpg").exists())
+
+    def test_file_downloaded_overridden_no_thread_pool(self):
+        class CustomGetImagesPipeline(ImagesPipeline):
+            def get_images(self, response, request, info, *, item=None):
+                yield from super().get_images(response, request, info, item=item)
+
+        class CustomConvertImagePipeline(ImagesPipeline):
+            def convert_image(self, image, size=None, response_body=None):
+                return super().convert_image(image, size, response_body)
+
+        _, buf = _create_image("JPEG", "RGB", (50, 50), (0, 127, 255))
+        resp = Response(url="https://dev.mydeco.com/mydeco.jpg", body=buf.getvalue())
+        req = Request(url="https://dev.mydeco.com/mydeco.jpg")
+
+        # Overridden methods that process images may not be thread-safe,
+        # images are processed in the reactor thread instead of the thread pool
+        for pipeline_class in (CustomGetImagesPipeline, CustomConvertImagePipeline):
+            pipeline = pipeline_class(self.tempdir)
+            pipeline.open_spider(None)
+            try:
+                self.assertIsNotNone(pipeline._thread_pool)
+                checksum = pipeline.file_downloaded(resp, req, pipeline.spiderinfo)
+            finally:
+                pipeline.close_spider(None)
+            self.assertEqual(checksum, hashlib.md5(buf.getvalue()).hexdigest())
+
     def test_get_images_old(self):
         self.pipeline.thumbs = {"small": (20, 20)}
         orig_im, buf = _create_image("JPEG", "RGB", (50, 50), (0, 0, 0))
@@ -312,6 +804,70 @@ class ImagesPipelineTestCase(unittest.TestCase):
         self.assertEqual(converted.mode, "RGB")
         self.assertEqual(converted.getcolors(), [(10000, (205, 230, 255))])
 
+    def test_convert_image_thumbnail_no_copy(self):
+        im, buf = _create_image("JPEG", "RGB", (100, 50), (0, 127, 255))
+        im.load()
+        with patch.object(Image.Image, "copy", autospec=True) as copy:
+            thumbnail, _ = self.pipeline.convert_image(
+                im, size=(10, 10), response_body=buf
+            )
+        copy.assert_not_called()
+        self.assertEqual(thumbnail.size, (10, 5))
+        self.assertEqual(im.size, (100, 50))
+
+    def test_convert_image_jpeg_quality(self):
+        im, _ = _create_image("PNG", "RGB", (100, 100), (0, 127, 255))
+        im.putdata([(random.randrange(256),) * 3 for _ in range(100 * 100)])
+
+        default = io.BytesIO()
+        im.save(default, "JPEG")
+        _, buf = self.pipeline.convert_image(im, response_body=io.BytesIO())
+        self.assertEqual(buf.getvalue(), default.getvalue())
+
+        pipeline = ImagesPipeline(self.tempdir, settings={"IMAGES_JPEG_QUALITY": 95})
+        expected = io.BytesIO()
+        im.save(expected, "JPEG", quality=95)
+        _, buf = pipeline.convert_image(im, response_body=io.BytesIO())
+        self.assertEqual(buf.getvalue(), expected.getvalue())
+        self.assertNotEqual(buf.getvalue(), default.getvalue())
+
+    def test_convert_image_thumbnail_fits(self):
+        im, buf = _create_image("JPEG", "RGB", (100, 50), (0, 127, 255))
+        with patch.object(Image.Image, "save", autospec=True) as save:
+            thumbnail, thumbnail_buf = self.pipeline.convert_image(
+                im, size=(100, 100), response_body=buf
+            )
+        save.assert_not_called()
+        self.assertIs(thumbnail, im)
+        self.assertIsNot(thumbnail_buf, buf)
+        self.assertEqual(thumbnail_buf.getvalue(), buf.getvalue())
+
+    def test_get_images_thumbnail_fits(self):
+        self.pipeline.thumbs = {"small": (20, 20), "big": (100, 100)}
+        for format in ("JPEG", "PNG"):
+            _, buf = _create_image(format, "RGB", (50, 50), (0, 127, 255))
+            resp = Response(
+                url="https://dev.mydeco.com/mydeco.jpg", body=buf.getvalue()
+            )
+            req = Request(url="https://dev.mydeco.com/mydeco.jpg")
+
+            with patch.object(
+                ImagesPipeline,
+                "_encode_jpeg",
+                autospec=True,
+                side_effect=ImagesPipeline._encode_jpeg,
+            ) as encode_jpeg:
+                images = list(
+                    self.pipeline.get_images(response=resp, request=req, info=object())
+                )
+            # Only the small thumbnail is encoded, and the full image when it
+            # is not a JPEG
+            self.assertEqual(encode_jpeg.call_count, 1 if format == "JPEG" else 2)
+            (_, full, full_buf), _, (_, big, big_buf) = images
+            self.assertEqual(big.size, (50, 50))
+            self.assertIsNot(big_buf, full_buf)
+            self.assertEqual(big_buf.getvalue(), full_buf.getvalue())
+
 
 class DeprecatedImagesPipeline(ImagesPipeline):
     def file_key(self, url):
@@ -626,6 +1182,25 @@ class ImagesPipelineTestCaseCustomSettings(unittest.TestCase):
             expected_value = settings.get(settings_attr)
             self.assertEqual(getattr(pipeline_cls, pipe_attr.lower()), expected_value)
 
+    def test_require_simd(self):
+        settings = Settings({"IMAGES_STORE": self.tempdir, "IMAGES_REQUIRE_SIMD": True})
+        with patch("scrapy.pipelines.images._is_pillow_simd", return_value=False):
+            with self.assertRaises(NotConfigured):
+                ImagesPipeline.from_settings(settings)
+        with patch("scrapy.pipelines.images._is_pillow_simd", return_value=True):
+            ImagesPipeline.from_settings(settings)
+
+    def test_libjpeg_turbo_warning(self):
+        settings = Settings({"IMAGES_STORE": self.tempdir})
+        with patch("scrapy.pipelines.images._has_libjpeg_turbo", return_value=False):
+            with LogCapture("scrapy.pipelines.images", level=logging.WARNING) as log:
+                ImagesPipeline.from_settings(settings)
+        self.assertIn("libjpeg-turbo", str(log))
+        with patch("scrapy.pipelines.images._has_libjpeg_turbo", return_value=True):
+            with LogCapture("scrapy.pipelines.images", level=logging.WARNING) as log:
+                ImagesPipeline.from_settings(settings)
+        log.check()
+
 
 class NoimagesDropTestCase(unittest.TestCase):
     def test_deprecation_warning(self):